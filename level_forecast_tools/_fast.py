@@ -0,0 +1,99 @@
+"""Compiled kernels for preprocessing hot paths (Numba is optional)"""
+
+import warnings
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+
+if njit is not None:
+
+    # No fastmath here: it would let Numba assume there are no NaNs,
+    # and missing readings have to be skipped
+    @njit(parallel=True, cache=True)
+    def _column_stats(arr, nfit):
+        mean = np.full(arr.shape[1], np.nan)
+        std = np.full(arr.shape[1], np.nan)
+
+        for j in prange(arr.shape[1]):
+            count, m, m2 = 0, 0.0, 0.0
+            for i in range(nfit):
+                x = arr[i, j]
+                if np.isnan(x):
+                    continue
+                count += 1
+                delta = x - m
+                m += delta/count
+                m2 += delta*(x - m)
+            if count > 0:
+                mean[j] = m
+            if count > 1:
+                std[j] = np.sqrt(m2/(count - 1))
+
+        return mean, std
+
+
+    @njit(parallel=True, cache=True)
+    def _standardise(arr, mean, std):
+        for i in prange(arr.shape[0]):
+            for j in range(arr.shape[1]):
+                arr[i, j] = (arr[i, j] - mean[j])/std[j]
+
+else:
+
+    def _column_stats(arr, nfit):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            return (np.nanmean(arr[:nfit], axis=0),
+                    np.nanstd(arr[:nfit], axis=0, ddof=1))
+
+
+    def _standardise(arr, mean, std):
+        arr -= mean
+        arr /= std
+
+
+
+def preprocess_inplace(arr, lag, train_size, mean=None, std=None):
+    '''
+    Shift the target (last) column of a 2D float32 array back by lag
+    rows, then standardise every column in place. Unless mean and std
+    are given, they are computed (skipping NaNs, ddof=1) over the first
+    train_size fraction of rows.
+
+    Parameters
+    -----------------------------------------------
+    arr: numpy.ndarray
+         writable 2D float32 array, one column per series
+
+    lag: int
+         forecast lag (only applied when there is more than one column)
+
+    train_size: float
+                fraction of rows used for the statistics
+
+    mean, std: array-like or None
+               precomputed per-column statistics
+
+    Returns
+    -----------------------------------------------
+    Standardised view of arr (without the last lag rows if shifted),
+    and the per-column mean and std as float32 arrays.
+    '''
+
+    if arr.shape[1] > 1:
+        arr[:-lag, -1] = arr[lag:, -1]
+        arr = arr[:-lag]
+
+    if mean is None and std is None:
+        mean, std = _column_stats(arr, int(train_size*len(arr)))
+
+    mean = np.asarray(mean, dtype=np.float32)
+    std = np.asarray(std, dtype=np.float32)
+    _standardise(arr, mean, std)
+
+    return arr, mean, std
@@ -3,19 +3,77 @@
 import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
-import sqlalchemy as sa
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
 from datetime import datetime, timedelta
 
 import os
+import re
+import time
+import shutil
+import tempfile
+import sqlite3
+import http.client
 from tqdm import tqdm
-import urllib.request
 import contextlib
-from itertools import cycle, chain
-from pandas.io import sql
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, chain, islice
+
+try:
+    from ciso8601 import parse_datetime as _parse_iso
+except ImportError:
+    _parse_iso = datetime.fromisoformat
+
+_iso_date = re.compile(r'^\d{4}-\d{2}-\d{2}')
+_nondigit = re.compile(r'\D')
 
 start_def = datetime.today()-timedelta(days=730)
 end_def = datetime.today()-timedelta(days=2)
 
+# value is read as text: the archive contains non-numeric readings
+# (e.g. pipe-separated duplicates) which are nulled before the cast
+_archive_convert = pacsv.ConvertOptions(
+    include_columns=['dateTime', 'stationReference', 'value'],
+    column_types={'dateTime': pa.string(), 'stationReference': pa.string(),
+                  'value': pa.string()})
+_numeric_value = r'^[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?$'
+
+# Pooled session for the concurrent archive downloads. The adapter is the
+# only retry layer for connection errors and throttling/server statuses;
+# _download_csv only retries failures part-way through the body
+_archive_retry = Retry(total=5, backoff_factor=0.3,
+                       status_forcelist=(429, 500, 502, 503, 504))
+_archive_session = requests.Session()
+_archive_session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=32,
+                                               max_retries=_archive_retry))
+
+
+def _to_datetime(value):
+    '''
+    Convert an ISO 8601 string, packed digits (YYYY MM DD hh mm ss)
+    or datetime to a naive datetime. Any timezone is ignored.
+    '''
+    
+    if isinstance(value, datetime):
+        return value
+    
+    value = str(value)
+    if _iso_date.match(value):
+        try:
+            return _parse_iso(value).replace(tzinfo=None, microsecond=0)
+        except ValueError:
+            pass
+    
+    return datetime.strptime(_nondigit.sub('', value)[:14].ljust(14, '0'), 
+                             "%Y%m%d%H%M%S")
+
+
 
 def generate_dtlist(start=start_def, end=end_def, count=1, 
                     assertion=True):
@@ -55,15 +113,8 @@ def generate_dtlist(start=start_def, end=end_def, count=1,
      Timestamp('2022-09-16 06:53:10'),
      Timestamp('2022-10-01 04:30:35')]
     '''
-    if not isinstance(start, datetime): 
-        start = datetime.strptime(
-            ''.join(filter(str.isdigit, str(start)))[13::-1].zfill(14)[::-1], 
-            "%Y%m%d%H%M%S")
-    
-    if not isinstance(end, datetime): 
-        end = datetime.strptime(
-            ''.join(filter(str.isdigit, str(end)))[13::-1].zfill(14)[::-1], 
-            "%Y%m%d%H%M%S")
+    start = _to_datetime(start)
+    end = _to_datetime(end)
     
     if assertion:
         assert start >= start_def and start < end_def and start <= end, \
@@ -75,8 +126,39 @@ def generate_dtlist(start=start_def, end=end_def, count=1,
 
 
 
+def _download_csv(csvurl, timeout=60):
+    '''
+    Download a single archive CSV into a spooled temporary file (held
+    in memory up to 64 MB, then on disk). Connection errors and error
+    statuses are retried by the session; a transfer that breaks off
+    part-way through the body is restarted with the same backoff.
+    Returns the file rewound to the start.
+    '''
+    
+    for attempt in range(_archive_retry.total + 1):
+        buf = tempfile.SpooledTemporaryFile(max_size=64<<20)
+        try:
+            with _archive_session.get(csvurl, stream=True, timeout=timeout) as resp:
+                resp.raise_for_status()
+                resp.raw.decode_content = True
+                shutil.copyfileobj(resp.raw, buf, 1<<20)
+        except requests.RequestException:
+            # Already retried by the adapter (or a client error)
+            buf.close()
+            raise
+        except (OSError, http.client.HTTPException, urllib3.exceptions.HTTPError):
+            buf.close()
+            if attempt == _archive_retry.total:
+                raise
+            time.sleep(_archive_retry.backoff_factor * 2**attempt)
+        else:
+            buf.seek(0)
+            return buf
+
+
+
 def get_archive_data(start=start_def, end=end_def, 
-                     overwrite=True, tbname='temp'):
+                     overwrite=True, tbname='temp', max_workers=16):
     '''
     Load archive data for a given time range to local database.
     
@@ -97,36 +179,116 @@ def get_archive_data(start=start_def, end=end_def,
     tbname: str
             name of table for loading data
             
+    max_workers: int
+                 number of daily files downloaded concurrently
+            
     Returns
     ----------------------------------------------------
     None
     '''
     
     dtlist = generate_dtlist(start, end)
+    csvurls = ["https://environment.data.gov.uk/flood-monitoring/"+\
+                f"archive/readings-full-{ts.strftime('%Y-%m-%d')}.csv"
+               for ts in pd.date_range(dtlist[0], dtlist[-1])]
     
     dbpath = os.sep.join((os.path.dirname(__file__), 
                           'data/archive/csv_database.db'))
-    csvdb = sa.create_engine('sqlite:///' + dbpath, 
-                             connect_args={'timeout': 15})
-    if overwrite:
-        sql.execute(f'DROP TABLE IF EXISTS {tbname}', csvdb)
+    with contextlib.closing(sqlite3.connect(dbpath, timeout=15, 
+                                            isolation_level=None)) as csvdb:
+        csvdb.execute('PRAGMA synchronous=OFF')
+        csvdb.execute('PRAGMA journal_mode=MEMORY')
+        
+        if overwrite:
+            csvdb.execute(f'DROP TABLE IF EXISTS {tbname}')
+        csvdb.execute(f'CREATE TABLE IF NOT EXISTS {tbname} ' +\
+                      '(dateTime TEXT, stationReference TEXT, value REAL)')
+        insert = f'INSERT INTO {tbname} (dateTime, stationReference, value) ' +\
+                    'VALUES (?, ?, ?)'
+        # Index is rebuilt once after the bulk load instead of being
+        # maintained on every insert
+        csvdb.execute(f'DROP INDEX IF EXISTS ix_{tbname}_ref_dt')
+        
+        load_ani = cycle(list("\|/-"))
+        
+        
+        # Downloads run ahead of the (single-threaded) sqlite writer, but
+        # only max_workers files are ever queued ahead of it
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        urliter = iter(csvurls)
+        futures = deque(executor.submit(_download_csv, csvurl) 
+                        for csvurl in islice(urliter, max_workers))
+        
+        try:
+            for _ in tqdm(range(len(csvurls))):
+                buf = futures.popleft().result()
+                for csvurl in islice(urliter, 1):
+                    futures.append(executor.submit(_download_csv, csvurl))
+            
+                csvdb.execute('BEGIN')
+                with buf:
+                    reader = pacsv.open_csv(buf,
+                                            read_options=pacsv.ReadOptions(block_size=32<<20),
+                                            convert_options=_archive_convert)
+                    for batch in reader:
+                        print(next(load_ani) + " Loading ...", end="\r")
+                        value = batch.column('value')
+                        value = pc.if_else(pc.match_substring_regex(value, _numeric_value),
+                                           value, pa.scalar(None, pa.string()))
+                        csvdb.executemany(insert, zip(batch.column('dateTime').to_pylist(),
+                                                      batch.column('stationReference').to_pylist(),
+                                                      value.cast(pa.float64()).to_pylist()))
+                csvdb.execute('COMMIT')
+        finally:
+            # On failure, drop the queued downloads and close the files of
+            # the ones that already finished
+            executor.shutdown(cancel_futures=True)
+            for future in futures:
+                if not future.cancelled() and future.exception() is None:
+                    future.result().close()
+        
+        csvdb.execute(f'CREATE INDEX IF NOT EXISTS ix_{tbname}_ref_dt ' +\
+                      f'ON {tbname} (stationReference, dateTime)')
+        csvdb.execute('ANALYZE')
+                
+    return None
+
+
+
+def _stack_readings(readings):
+    '''
+    Arrange time-sorted readings into one NaN-padded column per
+    station, without a per-group Python callback or a transpose.
+    '''
     
-    load_ani = cycle(list("\|/-"))
+    readings = readings.sort_values('stationReference', kind='stable')
+    refs, counts = np.unique(readings.stationReference.to_numpy(), 
+                             return_counts=True)
     
+    rows = np.arange(len(readings)) - np.repeat(np.cumsum(counts) - counts, counts)
+    cols = np.repeat(np.arange(len(refs)), counts)
     
-    for ts in tqdm(pd.date_range(dtlist[0], dtlist[-1]).tolist()):
-        csvurl = "https://environment.data.gov.uk/flood-monitoring/"+\
-                    f"archive/readings-full-{ts.strftime('%Y-%m-%d')}.csv"
+    values = np.full((counts.max(initial=0), len(refs)), np.nan)
+    values[rows, cols] = readings.value.to_numpy(dtype=float, na_value=np.nan)
     
-        with contextlib.closing(urllib.request.urlopen(url=csvurl)) as rd:
-            for chunk in pd.read_csv(rd, chunksize=10000):
-                print(next(load_ani) + " Loading ...", end="\r")
-                chunk.value = pd.to_numeric(chunk.value, errors="coerce")
-                chunk[['dateTime','stationReference',
-                       'value']].to_sql(tbname, csvdb, if_exists='append', 
-                                        index=False)
-                
-    return None
+    return pd.DataFrame(values, columns=refs)
+
+
+
+def _write_interval(parts, lowbound, outdir):
+    '''
+    Write the readings of one interval to valser_<lowbound>.tmp in outdir.
+    Intervals without readings are skipped.
+    '''
+    
+    if not parts:
+        return
+    
+    valser = _stack_readings(pd.concat(parts))
+    
+    outpath = os.sep.join((os.getcwd(), outdir, 
+                           f'valser_{lowbound[:13]}.tmp'))
+    valser.to_csv(outpath, index=False)
 
 
 
@@ -164,37 +326,54 @@ def load_archive_data(staref, start=start_def, end=end_def,
     
     dbpath = os.sep.join((os.path.dirname(__file__), 
                           'data/archive/csv_database.db'))
-    csvdb = sa.create_engine('sqlite:///' + dbpath, 
-                             connect_args={'timeout': 15})
-    if not sa.inspect(csvdb).has_table(tbname):
-        get_archive_data(start, end, tbname)
     
     if isinstance(staref, str):
         staref = [staref]
     staref = str(staref).replace('[','(').replace(']',')')
     
     dtlist = generate_dtlist(start, end, count)
+    bounds = [ts.strftime("%Y-%m-%dT%H:%M:%SZ") for ts in dtlist]
+    nint = len(bounds) - 1
     
-    for idx, ts in enumerate(tqdm(dtlist)):
-        try:
-            upbound = dtlist[idx+1].strftime("%Y-%m-%dT%H:%M:%SZ")
-            lowbound = dtlist[idx].strftime("%Y-%m-%dT%H:%M:%SZ")
-
-            valser = pd.read_sql_query(
-                f'SELECT stationReference, value FROM {tbname} ' +\
-                f'WHERE (stationReference in {staref}) ' +\
-                f'AND (dateTime < "{upbound}") ' +\
-                f'AND (dateTime >= "{lowbound}")', csvdb
-            ).groupby('stationReference').value.apply(list).apply(pd.Series).transpose()
-
+    with contextlib.closing(sqlite3.connect(dbpath, timeout=15)) as csvdb:
+        if csvdb.execute("SELECT name FROM sqlite_master " +\
+                         "WHERE type='table' AND name=?", (tbname,)).fetchone() is None:
+            get_archive_data(start, end, tbname=tbname)
             
-            outpath = os.sep.join((os.getcwd(), outdir, 
-                                   f'valser_{lowbound[:13]}.tmp'))
-            with open(outpath,'w') as outfile:
-                outfile.write(valser.to_csv(index=False))
+        csvdb.execute('PRAGMA mmap_size=268435456')
+        csvdb.execute('PRAGMA cache_size=-65536')
+        
+        # Stream the whole (time-sorted) range in one query and write each
+        # interval once the rows have moved past its upper bound, so only
+        # the intervals in progress are held in memory
+        chunks = pd.read_sql_query(
+            f'SELECT dateTime, stationReference, value FROM {tbname} ' +\
+            f'WHERE (stationReference in {staref}) ' +\
+            f'AND (dateTime < "{bounds[-1]}") ' +\
+            f'AND (dateTime >= "{bounds[0]}") ORDER BY dateTime', 
+            csvdb, chunksize=100000
+        )
         
-        except:
-            continue
+        parts = [[] for _ in range(nint)]
+        done = 0
+        
+        with tqdm(total=nint) as pbar:
+            for chunk in chunks:
+                cuts = np.searchsorted(chunk.dateTime.to_numpy(), bounds)
+                for idx in range(done, nint):
+                    if cuts[idx+1] > cuts[idx]:
+                        parts[idx].append(chunk.iloc[cuts[idx]:cuts[idx+1]])
+                
+                complete = np.searchsorted(cuts[1:], len(chunk))
+                for idx in range(done, complete):
+                    _write_interval(parts[idx], bounds[idx], outdir)
+                    parts[idx] = None
+                    pbar.update()
+                done = max(done, complete)
+                
+            for idx in range(done, nint):
+                _write_interval(parts[idx], bounds[idx], outdir)
+                pbar.update()
         
             
     return None
@@ -3,8 +3,17 @@
 import pandas as pd
 import sqlalchemy as sa
 import os
+import functools
 from pandas.io import sql
 
+
+@functools.lru_cache(maxsize=4)
+def _engine(dbpath):
+    '''Shared SQLAlchemy engine (and connection pool) per database file'''
+    return sa.create_engine('sqlite:///' + dbpath, 
+                            connect_args={'timeout': 15})
+
+
 class station_info():
     
     def __init__(self):
@@ -20,8 +29,7 @@ class database_info():
         
         self.dbpath = os.sep.join((os.path.dirname(__file__), 
                                    'data/archive/csv_database.db'))
-        self.engine = sa.create_engine('sqlite:///' + self.dbpath, 
-                                       connect_args={'timeout': 15})
+        self.engine = _engine(self.dbpath)
         
         
     def infolist(self):
@@ -1,14 +1,24 @@
 """Geodata visualization and translation"""
 
 import os
+import math
+import pickle
+import functools
+from pathlib import Path
 
 import numpy as np
 import pandas as pd
 import pygmt
+from scipy.spatial import cKDTree
 from sklearn.neighbors import NearestNeighbors
 
 from level_forecast_tools.live import *
 
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
 
 class Ellipsoid(object):
     """ Data structure for a global ellipsoid. """
@@ -34,7 +44,72 @@ class Datum(Ellipsoid):
         self.H = H
 
 
-def get_easting_northing_from_gps_lat_long(phi, lam, rads=False):
+# OSGB36 datum and National Grid projection constants
+_OSGB_A = 6377563.396
+_OSGB_B = 6356256.910
+_OSGB_F0 = 0.9996012717
+_OSGB_PHI0 = math.radians(49.0)
+_OSGB_LAM0 = math.radians(-2.)
+_OSGB_E0 = 400000.
+_OSGB_N0 = -100000.
+
+_DAT = Datum(a=_OSGB_A, b=_OSGB_B, F_0=_OSGB_F0, phi_0=_OSGB_PHI0,
+             lam_0=_OSGB_LAM0, E_0=_OSGB_E0, N_0=_OSGB_N0, H=24.7)
+_OSGB_E2 = _DAT.e2
+
+# Coefficients of the meridional arc series M in n
+_N_POLY_COEFS = (1 + _DAT.n + 5 / 4 * _DAT.n ** 2 + 5 / 4 * _DAT.n ** 3,
+                 3 * _DAT.n + 3 * _DAT.n ** 2 + 21 / 8 * _DAT.n ** 3,
+                 15 / 8 * _DAT.n ** 2 + 15 / 8 * _DAT.n ** 3,
+                 35 / 24 * _DAT.n ** 3)
+
+
+if njit is not None:
+
+    # Points are split across Numba's thread pool; set NUMBA_NUM_THREADS
+    # before import to limit the number of threads used
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _osgb36(phi, lam, out_E, out_N):
+        '''Fused per-point OSGB36 projection (radians in, metres out)'''
+
+        a, b, F_0, e2 = _OSGB_A, _OSGB_B, _OSGB_F0, _OSGB_E2
+        phi_0, lam_0 = _OSGB_PHI0, _OSGB_LAM0
+        c0, c1, c2, c3 = _N_POLY_COEFS
+
+        for i in prange(phi.size):
+            p = phi[i]
+            sp = math.sin(p)
+            cp = math.cos(p)
+            t2 = (sp * sp) / (cp * cp)
+
+            v = a * F_0 * (1 - e2 * sp ** 2) ** (-0.5)
+            rho = a * F_0 * (1 - e2) * (1 - e2 * sp ** 2) ** (-1.5)
+            eta2 = v / rho - 1
+
+            M = b * F_0 * (c0 * (p - phi_0) - c1 * math.sin(p - phi_0) * math.cos(p + phi_0) +
+                           c2 * math.sin(2 * (p - phi_0)) * math.cos(2 * (p + phi_0)) -
+                           c3 * math.sin(3 * (p - phi_0)) * math.cos(3 * (p - phi_0)))
+
+            I = M + _OSGB_N0
+            sc = sp * cp
+            II = v / 2 * sc
+            III = v / 24 * sc * cp * cp * (5 - t2 + 9 * eta2)
+            IIIA = v / 720 * sc * cp ** 4 * (61 - 58 * t2 + t2 * t2)
+            IV = v * cp
+            V = v / 6 * cp ** 3 * (v / rho - t2)
+            VI = v / 120 * cp ** 5 * (5 - 18 * t2 + t2 * t2 + 14 * eta2 - 58 * t2 * eta2)
+
+            dl = lam[i] - lam_0
+            dl2 = dl * dl
+            out_N[i] = I + dl2 * (II + dl2 * (III + dl2 * IIIA))
+            out_E[i] = _OSGB_E0 + dl * (IV + dl2 * (V + dl2 * VI))
+
+else:
+    _osgb36 = None
+
+
+
+def get_easting_northing_from_gps_lat_long(phi, lam, rads=False, dtype=np.float64):
     '''
     Get OSGB36 easting/northing from GPS latitude and longitude pairs.
 
@@ -49,6 +124,11 @@ def get_easting_northing_from_gps_lat_long(phi, lam, rads=False):
     rads: bool
         If true, specifies input is is radians.
         
+    dtype: numpy float dtype
+        Working and output precision. numpy.float32 halves the memory
+        traffic for large inputs; easting/northing are then accurate to
+        about a metre, far below the 0.05 degree (~3 km) data grid.
+        
     Returns
     --------------------------------------------
     numpy.ndarray
@@ -62,39 +142,281 @@ def get_easting_northing_from_gps_lat_long(phi, lam, rads=False):
     Based on the formulas in "A guide to coordinate systems in Great Britain".
     See also https://webapps.bgs.ac.uk/data/webservices/convertForm.cfm
     '''
-    dat = Datum(a=6377563.396, b=6356256.910, F_0=0.9996012717, 
-                phi_0=np.deg2rad(49.0), lam_0=np.deg2rad(-2.), 
-                E_0=400000, N_0=-100000, H=24.7)
+    dat = _DAT
+
+    # Contiguous arrays of the working dtype up front so every ufunc below
+    # takes the SIMD loops; np.radians then writes a new array, so the
+    # caller's input is untouched
+    phi = np.asarray(phi, dtype=dtype, order='C')
+    lam = np.asarray(lam, dtype=dtype, order='C')
+
+    if not rads:
+        phi = np.radians(phi)
+        lam = np.radians(lam)
+
+    if _osgb36 is not None:
+        phi, lam = np.broadcast_arrays(phi, lam)
+        E, N = np.empty(phi.shape, dtype), np.empty(phi.shape, dtype)
+        _osgb36(np.ascontiguousarray(phi).ravel(), np.ascontiguousarray(lam).ravel(),
+                E.reshape(-1), N.reshape(-1))
+        return E, N
+
+    c0, c1, c2, c3 = _N_POLY_COEFS
+    sin_phi = np.sin(phi)
+    cos_phi = np.cos(phi)
+    sin2 = sin_phi * sin_phi
+    cos3 = cos_phi ** 3
+    cos5 = cos3 * cos_phi * cos_phi
+    tan2 = sin2 / (cos_phi * cos_phi)
+    tan4 = tan2 * tan2
+
+    v = dat.a * dat.F_0 * (1 - dat.e2 * sin2) ** (-0.5)
+
+    rho = dat.a * dat.F_0 * (1 - dat.e2) * (1 - dat.e2 * sin2) ** (-1.5)
+    eta2 = v / rho - 1
 
-    ell = Ellipsoid(a=6378137, b=6356752.3142, F_0=0.9996)
+    M = dat.b * dat.F_0 * (c0 * (phi - dat.phi_0) - c1 * np.sin(phi - dat.phi_0) * np.cos(phi + dat.phi_0) +
+                           c2 * np.sin(2 * (phi - dat.phi_0)) * np.cos(2 * (phi + dat.phi_0)) -
+                           c3 * np.sin(3 * (phi - dat.phi_0)) * np.cos(3 * (phi - dat.phi_0)))
 
-    if rads == False:
-        phi = np.deg2rad(np.asarray(phi))
-        lam = np.deg2rad(np.asarray(lam))
+    I = M + dat.N_0
+    sc = sin_phi * cos_phi
+    II = v / 2 * sc
+    III = v / 24 * sc * cos_phi * cos_phi * (5 - tan2 + 9 * eta2)
+    IIIA = v / 720 * sc * cos3 * cos_phi * (61 - 58 * tan2 + tan4)
+    IV = v * cos_phi
+    V = v / 6 * cos3 * (v / rho - tan2)
+    VI = v / 120 * cos5 * (5 - 18 * tan2 + tan4 + 14 * eta2 - 58 * tan2 * eta2)
 
-    n = (dat.a - dat.b) / (dat.a + dat.b)
-    v = dat.a * dat.F_0 * (1 - dat.e2 * np.sin(phi) ** 2) ** (-0.5)
+    dl = lam - dat.lam_0
+    dl2 = dl * dl
+    dl3 = dl2 * dl
+    dl4 = dl2 * dl2
+    dl5 = dl4 * dl
+    dl6 = dl3 * dl3
 
-    rho = dat.a * dat.F_0 * (1 - dat.e2) * (1 - dat.e2 * np.sin(phi) ** 2) ** (-1.5)
-    eta2 = v / rho - 1
+    N = I + II * dl2 + III * dl4 + IIIA * dl6
+    E = dat.E_0 + IV * dl + V * dl3 + VI * dl5
 
-    M = dat.b * dat.F_0 * ((1 + n + 5 / 4 * n ** 2 + 5 / 4 * n ** 3) * (phi - dat.phi_0) - (
-            3 * n + 3 * n ** 2 + 21 / 8 * n ** 3) * np.sin(phi - dat.phi_0) * np.cos(phi + dat.phi_0) + \
-                           (15 / 8 * n ** 2 + 15 / 8 * n ** 3) * np.sin(2 * (phi - dat.phi_0)) * np.cos(
-                2 * (phi + dat.phi_0)) - 35 / 24 * n ** 3 * np.sin(3 * (phi - dat.phi_0)) * np.cos(3 * (phi - dat.phi_0)))
+    return np.asarray(E), np.asarray(N)
 
-    I = M + dat.N_0
-    II = v / 2 * np.sin(phi) * np.cos(phi)
-    III = v / 24 * np.sin(phi) * np.cos(phi) ** 3 * (5 - np.tan(phi) ** 2 + 9 * eta2)
-    IIIA = v / 720 * np.sin(phi) * np.cos(phi) ** 5 * (61 - 58 * np.tan(phi) ** 2 + np.tan(phi) ** 4)
-    IV = v * np.cos(phi)
-    V = v / 6 * np.cos(phi) ** 3 * (v / rho - np.tan(phi) ** 2)
-    VI = v / 120 * np.cos(phi) ** 5 * (5 - 18 * np.tan(phi) ** 2 + np.tan(phi) ** 4 + 14 * eta2 - 58 * (np.tan(phi) ** 2) * eta2)
 
-    N = I + II * (lam - dat.lam_0) ** 2 + III * (lam - dat.lam_0) ** 4 + IIIA * (lam - dat.lam_0) ** 6
-    E = dat.E_0 + IV * (lam - dat.lam_0) + V * (lam - dat.lam_0) ** 3 + VI * (lam - dat.lam_0) ** 5
 
-    return np.array(E), np.array(N)
+_DATA_DIR = Path(__file__).parent / 'data'
+_RIVER_CSV = _DATA_DIR / 'riverdata.csv'
+_RAIN_CSV = _DATA_DIR / 'raindata.csv'
+_TIDE_CSV = _DATA_DIR / 'tidedata.csv'
+_COAST_PKL = _DATA_DIR / 'coast_kdtree.pkl'
+
+# Station table columns used by the grid helpers (the rest are never read)
+_STATION_DTYPES = {'lat': 'float64', 'long': 'float64',
+                   'latestReading': 'float64', 'typicalRangeHigh': 'float64'}
+_RIVER_COLS = ['stationReference', 'lat', 'long', 'latestReading', 'typicalRangeHigh']
+_RAIN_COLS = ['stationReference', 'lat', 'long', 'latestReading']
+_TIDE_COLS = ['lat', 'long', 'latestReading']
+
+
+
+def _read_stations(path, usecols=None):
+    '''
+    Read a station table, restricted to usecols if given, with fixed
+    float dtypes for the coordinate and reading columns. Single place
+    to change the reader backend for all station tables.
+    '''
+
+    return pd.read_csv(path, usecols=usecols, dtype=_STATION_DTYPES)
+
+
+
+def _disk_cached_grid(csv_path, build):
+    '''
+    Grid and xyz DataFrame from build(), with the xyz also kept next to
+    csv_path as <name>.interp.parquet. While that file is newer than
+    the csv, the grid is restored from it with xyz2grd instead of being
+    interpolated again.
+    '''
+
+    pq_path = csv_path.with_suffix('.interp.parquet')
+    try:
+        if os.path.getmtime(pq_path) > os.path.getmtime(csv_path):
+            xyz = pd.read_parquet(pq_path)
+            return pygmt.xyz2grd(data=xyz, region="-5.5/2/50/55", spacing=0.05), xyz
+    except Exception:
+        pass
+
+    grd, xyz = build()
+    try:
+        xyz.to_parquet(pq_path, index=False)
+    except OSError:
+        pass
+
+    return grd, xyz
+
+
+
+def _build_river_grid(live_data=False):
+    '''
+    Interpolate river values (current level over typical max range)
+    onto a 0.05 degree grid. Returns the grid and its xyz DataFrame.
+    '''
+
+    river_df = _read_stations(_RIVER_CSV, _RIVER_COLS)
+
+    if live_data:
+        try:
+            stareflist = river_df.stationReference
+            print(f'Loading Data for {len(stareflist)} stations...')
+            riverlive_df = get_live_station_measures(station_reference=stareflist, param='level')
+            riverlive_df = riverlive_df[~riverlive_df.index.duplicated(keep='last')]
+            print('Data Loaded!')
+            river_df.latestReading = riverlive_df['latestReading.value'].tolist()
+        except:
+            print('Connection Timed Out: Switching to default values')
+
+    riversta_lat = river_df.lat.to_numpy()
+    riversta_long = river_df.long.to_numpy()
+    riversta_val = (-(river_df.typicalRangeHigh-river_df.latestReading) / river_df.typicalRangeHigh).to_numpy()
+
+    riversta_arr = pygmt.blockmean(x=riversta_long, y=riversta_lat, z=riversta_val, region="-5.5/2/50/55",
+                                   spacing=0.05).to_numpy()
+    rsinterp_grd = pygmt.surface(data=riversta_arr, region="-5.5/2/50/55", spacing=0.05)
+
+    return rsinterp_grd, pygmt.grd2xyz(rsinterp_grd)
+
+
+
+@functools.lru_cache(maxsize=8)
+def _compute_river_grid(mtime=None):
+    '''River grid from riverdata.csv; mtime is only part of the cache key'''
+
+    return _disk_cached_grid(_RIVER_CSV, _build_river_grid)
+
+
+
+def _river_grid(live_data=False):
+    '''River grid, cached until riverdata.csv changes; live data is never cached'''
+
+    if live_data:
+        return _build_river_grid(live_data=True)
+    return _compute_river_grid(mtime=os.path.getmtime(_RIVER_CSV))
+
+
+
+def _build_rain_grid(live_data=False):
+    '''
+    Interpolate rainfall values onto a 0.05 degree grid. Returns the
+    grid and its xyz DataFrame.
+    '''
+
+    rain_df = _read_stations(_RAIN_CSV, _RAIN_COLS)
+
+    if live_data:
+        try:
+            stareflist = rain_df.stationReference
+            print(f'Loading Data for {len(stareflist)} stations...')
+            rainlive_df = get_live_station_measures(station_reference=stareflist)
+            rainlive_df = rainlive_df[~rainlive_df.index.duplicated(keep='last')]
+            print('Data Loaded!')
+            rain_df.latestReading = rainlive_df['latestReading.value'].tolist()
+        except:
+            print('Connection Timed Out: Switching to default values')
+
+    rainsta_lat = rain_df.lat.to_numpy()
+    rainsta_long = rain_df.long.to_numpy()
+    rainsta_val = rain_df.latestReading.to_numpy()
+
+    rainsta_arr = pygmt.blockmean(x=rainsta_long, y=rainsta_lat, z=rainsta_val, region="-5.5/2/50/55",
+                                  spacing=0.05).to_numpy()
+    rsinterp_grd = pygmt.surface(data=rainsta_arr, region="-5.5/2/50/55", spacing=0.05)
+
+    return rsinterp_grd, pygmt.grd2xyz(rsinterp_grd)
+
+
+
+@functools.lru_cache(maxsize=8)
+def _compute_rain_grid(mtime=None):
+    '''Rainfall grid from raindata.csv; mtime is only part of the cache key'''
+
+    return _disk_cached_grid(_RAIN_CSV, _build_rain_grid)
+
+
+
+def _rain_grid(live_data=False):
+    '''Rainfall grid, cached until raindata.csv changes; live data is never cached'''
+
+    if live_data:
+        return _build_rain_grid(live_data=True)
+    return _compute_rain_grid(mtime=os.path.getmtime(_RAIN_CSV))
+
+
+
+@functools.lru_cache(maxsize=8)
+def _compute_tide_grid(mtime=None):
+    '''
+    Interpolate tidal range values onto a 0.05 degree grid. mtime (of
+    the csv) is only part of the cache key. Returns the grid, its xyz
+    DataFrame and the station table.
+    '''
+
+    tide_df = _read_stations(_TIDE_CSV, _TIDE_COLS)
+
+    tidesta_lat = tide_df.lat.to_numpy()
+    tidesta_long = tide_df.long.to_numpy()
+    tidesta_val = tide_df.latestReading.to_numpy()
+
+    tsinterp_grd = pygmt.surface(x=tidesta_long, y=tidesta_lat, z=tidesta_val, region="-5.5/2/50/55", spacing=0.05)
+
+    return tsinterp_grd, pygmt.grd2xyz(tsinterp_grd), tide_df
+
+
+
+def _tide_mtime():
+    '''Modification time of tidedata.csv, used as a cache key'''
+
+    return os.path.getmtime(_TIDE_CSV)
+
+
+
+def _tide_grid():
+    '''Tidal range grid, cached until tidedata.csv changes'''
+
+    return _compute_tide_grid(mtime=_tide_mtime())
+
+
+
+@functools.lru_cache(maxsize=1)
+def _tide_df_cached(mtime):
+    '''
+    Sea nodes of the tidal range grid with their OSGB36 Easting and
+    Northing, and a KD-tree over those coordinates. Persisted to
+    data/coast_kdtree.pkl, which is rebuilt whenever mtime (of the
+    csv) no longer matches the one it was built from.
+    '''
+
+    try:
+        with open(_COAST_PKL, 'rb') as f:
+            cached = pickle.load(f)
+        if cached['mtime'] == mtime:
+            return cached['tide_df'], cached['tree']
+    except Exception:
+        pass
+
+    _, tide_df, _ = _compute_tide_grid(mtime=mtime)
+    tide_df = tide_df.copy()
+    tide_df['Easting'], tide_df['Northing'] = get_easting_northing_from_gps_lat_long(
+        tide_df.y.to_numpy(), tide_df.x.to_numpy()
+    )
+    tide_df = pygmt.select(tide_df, mask='k/s/k/s/k')
+    coast = cKDTree(tide_df[['Easting', 'Northing']].to_numpy())
+
+    try:
+        with open(_COAST_PKL, 'wb') as f:
+            pickle.dump({'mtime': mtime, 'tide_df': tide_df, 'tree': coast}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        pass
+
+    return tide_df, coast
 
 
 
@@ -127,29 +449,7 @@ def riverplt(plt_range=1.5, live_data=False, showplt=True, filename=None):
     Wales.
     '''
 
-    riverdata_path = os.sep.join((os.path.dirname(__file__),
-                                  'data', 'riverdata.csv'))
-    river_df = pd.read_csv(riverdata_path)
-
-    if live_data:
-        try:
-            stareflist = pd.read_csv(riverdata_path).stationReference
-            print(f'Loading Data for {len(stareflist)} stations...')
-            riverlive_df = get_live_station_measures(station_reference=stareflist, param='level')
-            riverlive_df = riverlive_df[~riverlive_df.index.duplicated(keep='last')]
-            print('Data Loaded!')
-            river_df.latestReading = riverlive_df['latestReading.value'].tolist()
-        except:
-            print('Connection Timed Out: Switching to default values')
-
-    riversta_lat = river_df.lat.tolist()
-    riversta_long = river_df.long.tolist()
-    riversta_val = (-(river_df.typicalRangeHigh-river_df.latestReading) / river_df.typicalRangeHigh).tolist()
-
-    riversta_arr = pygmt.blockmean(x=riversta_long, y=riversta_lat, z=riversta_val, region="-5.5/2/50/55",
-                                   spacing=0.05).to_numpy()
-    rsinterp_grd = pygmt.surface(data=riversta_arr, region="-5.5/2/50/55", spacing=0.05)
-    rsinterp_xyz = pygmt.grd2xyz(rsinterp_grd)
+    rsinterp_grd, rsinterp_xyz = _river_grid(live_data)
 
     fig = pygmt.Figure()
     fig.basemap(region="-5.5/2/50/55", projection="M15c", frame="ag")
@@ -163,7 +463,7 @@ def riverplt(plt_range=1.5, live_data=False, showplt=True, filename=None):
     if filename is not None:
         fig.savefig(filename)
 
-    return rsinterp_xyz,fig
+    return rsinterp_xyz.copy(),fig
 
 
 
@@ -194,29 +494,7 @@ def rainplt(plt_range=0.3, live_data=False, showplt=True, filename=None):
     Wales.
     '''
 
-    raindata_path = os.sep.join((os.path.dirname(__file__),
-                                 'data', 'raindata.csv'))
-    rain_df = pd.read_csv(raindata_path)
-
-    if live_data:
-        try:
-            stareflist = pd.read_csv(raindata_path).stationReference
-            print(f'Loading Data for {len(stareflist)} stations...')
-            rainlive_df = get_live_station_measures(station_reference=stareflist)
-            rainlive_df = rainlive_df[~rainlive_df.index.duplicated(keep='last')]
-            print('Data Loaded!')
-            rain_df.latestReading = rainlive_df['latestReading.value'].tolist()
-        except:
-            print('Connection Timed Out: Switching to default values')
-
-    rainsta_lat = rain_df.lat.tolist()
-    rainsta_long = rain_df.long.tolist()
-    rainsta_val = rain_df.latestReading.tolist()
-
-    rainsta_arr = pygmt.blockmean(x=rainsta_long, y=rainsta_lat, z=rainsta_val, region="-5.5/2/50/55",
-                                  spacing=0.05).to_numpy()
-    rsinterp_grd = pygmt.surface(data=rainsta_arr, region="-5.5/2/50/55", spacing=0.05)
-    rsinterp_xyz = pygmt.grd2xyz(rsinterp_grd)
+    rsinterp_grd, rsinterp_xyz = _rain_grid(live_data)
 
     fig = pygmt.Figure()
     fig.basemap(region="-5.5/2/50/55", projection="M15c", frame="ag")
@@ -230,7 +508,7 @@ def rainplt(plt_range=0.3, live_data=False, showplt=True, filename=None):
     if filename is not None:
         fig.savefig(filename)
 
-    return rsinterp_xyz,fig
+    return rsinterp_xyz.copy(),fig
 
 
 
@@ -253,18 +531,11 @@ def tideplt(showplt=True, filename=None):
     England and Wales.
     '''
 
-    tidedata_path = os.sep.join((os.path.dirname(__file__),
-                                 'data', 'tidedata.csv'))
-    tide_df = pd.read_csv(tidedata_path)
+    tsinterp_grd, tsinterp_xyz, tide_df = _tide_grid()
 
-    tidesta_lat = tide_df.lat.tolist()
-    tidesta_long = tide_df.long.tolist()
-    tidesta_val = tide_df.latestReading.tolist()
-    
-    tidesta_arr = pygmt.blockmean(x=tidesta_long, y=tidesta_lat, z=tidesta_val, region="-5.5/2/50/55",
-                                  spacing=0.05).to_numpy()
-    tsinterp_grd = pygmt.surface(x=tidesta_long, y=tidesta_lat, z=tidesta_val, region="-5.5/2/50/55", spacing=0.05)
-    tsinterp_xyz = pygmt.grd2xyz(tsinterp_grd)
+    tidesta_lat = tide_df.lat.to_numpy()
+    tidesta_long = tide_df.long.to_numpy()
+    tidesta_val = tide_df.latestReading.to_numpy()
 
     fig = pygmt.Figure()
     fig.basemap(region="-5.5/2/50/55", projection="M15c", frame="ag")
@@ -279,7 +550,19 @@ def tideplt(showplt=True, filename=None):
     if filename is not None:
         fig.savefig(filename)
     
-    return tsinterp_xyz,fig
+    return tsinterp_xyz.copy(),fig
+
+
+
+def _grid_lookup(grid_xyz, points):
+    '''
+    Grid value at the (x, y) node of every point (NaN where there is
+    none), as one hashed join rather than a scan per point.
+    '''
+
+    grid = grid_xyz.round({'x': 2, 'y': 2}).set_index(['x', 'y']).z
+
+    return grid.reindex(pd.MultiIndex.from_frame(points[['x', 'y']])).to_numpy()
 
 
 
@@ -308,39 +591,29 @@ def rrt_value(long, lat, from_live=False):
     coast (in m) and tide range data for each lat-long pair 
     in a Pandas DataFrame.
     '''
+    # A single point goes through the same path as a one-element array
+    long, lat = np.atleast_1d(long), np.atleast_1d(lat)
+
     eas, nor = get_easting_northing_from_gps_lat_long(lat, long)
 
     coordf = pd.DataFrame({'Longitude': long, 'Latitude': lat,
                            'Easting': eas, 'Northing': nor})
     coordf = pygmt.select(coordf, mask='s/k/s/k/s', region="-5.5/2/50/55")
-    coordf[['x', 'y']] = coordf[['Longitude', 'Latitude']].apply(
-        lambda x: np.round(np.round(x / 0.05, 0) * 0.05, 2)
-    )
+    xy = np.round(np.round(coordf[['Longitude', 'Latitude']].to_numpy() / 0.05) * 0.05, 2)
+    coordf['x'], coordf['y'] = xy[:, 0], xy[:, 1]
 
     
-    river_df,_ = riverplt(showplt=False,live_data=from_live)
-    rain_df,_ = rainplt(showplt=False,live_data=from_live)
+    _, river_df = _river_grid(from_live)
+    _, rain_df = _rain_grid(from_live)
 
-    tide_df,_ = tideplt(showplt=False)
-    tide_df['Easting'], tide_df['Northing'] = get_easting_northing_from_gps_lat_long(
-        tide_df.y.tolist(), tide_df.x.tolist()
-    )
-    tide_df = pygmt.select(tide_df, mask='k/s/k/s/k')
-    coast = NearestNeighbors(n_neighbors=1)
-    coast.fit(tide_df[['Easting', 'Northing']])
-
-    def retrval(infodf, loc):
-        try:
-            return infodf[(infodf.x == loc.x) & (infodf.y == loc.y)].z.values[0]
-        except IndexError:
-            return np.nan
+    tide_df, coast = _tide_df_cached(_tide_mtime())
 
-    coordf['riv_val'] = coordf.apply(lambda x: retrval(river_df, x), axis=1)
-    coordf['rain_val'] = coordf.apply(lambda x: retrval(rain_df, x), axis=1)
+    coordf['riv_val'] = _grid_lookup(river_df, coordf)
+    coordf['rain_val'] = _grid_lookup(rain_df, coordf)
 
-    coordf['coast_dist'], coordf['tide_val'] = coast.kneighbors(coordf[['Easting','Northing']])
-    coordf.tide_val = coordf.tide_val.apply(lambda x: tide_df.iloc[x].z)
-    coordf.coast_dist = coordf.coast_dist.apply(lambda x: np.round(x, -2))
+    dist, idx = coast.query(coordf[['Easting','Northing']].to_numpy(), k=1)
+    coordf['coast_dist'] = np.round(dist, -2)
+    coordf['tide_val'] = tide_df.z.to_numpy()[idx]
     
     return coordf.drop(columns=['x','y'])
 
@@ -370,10 +643,9 @@ def get_nearest_stations(long, lat, radius=30000, qualifier="river"):
     Pandas DataFrame of nearest stations sorted by distance.
     '''
     
-    path =  os.sep.join((os.path.dirname(__file__), 
-                         'data', f'{qualifier}data.csv'))
+    path = _DATA_DIR / f'{qualifier}data.csv'
     
-    stndf = pd.read_csv(path)
+    stndf = _read_stations(path)
     eas, nor = get_easting_northing_from_gps_lat_long(lat, long)
     
     stnmap = NearestNeighbors(radius=radius)
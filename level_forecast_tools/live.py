@@ -4,14 +4,31 @@ import pandas as pd
 import numpy as np
 
 import os
+import re
 import argparse
-import json
+from pathlib import Path
+import http.client
 import urllib.request
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from itertools import chain
 from concurrent.futures import ThreadPoolExecutor, as_completed, wait
-import signal
 from tqdm import tqdm
 
-def get_live_station_measures(station_reference=None, param='rainfall', filename=None):
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
+# Shared keep-alive session for the per-station requests issued from
+# the thread pools below, so connections are reused across stations
+_session = requests.Session()
+_session.mount('https://', HTTPAdapter(pool_connections=32, pool_maxsize=32,
+                                      max_retries=Retry(total=3, backoff_factor=0.2)))
+
+def get_live_station_measures(station_reference=None, param='rainfall', filename=None,
+                              timeout=30):
     """Return readings from live API.
 
     Parameters
@@ -26,6 +43,9 @@ def get_live_station_measures(station_reference=None, param='rainfall', filename
     station_reference: str, array-like or None
         station_reference to return.
         
+    timeout: float
+        Socket timeout in seconds
+        
     Returns
     ------------------------------------------
     Pandas DataFrame of all most recent measures.
@@ -35,17 +55,28 @@ def get_live_station_measures(station_reference=None, param='rainfall', filename
             'Please specify a valid parameter: "rainfall" or "level" or ""'
         
     with urllib.request.urlopen(
-        f'https://environment.data.gov.uk/flood-monitoring/id/measures.json?parameter={param}&_limit=10000'
+        f'https://environment.data.gov.uk/flood-monitoring/id/measures.json?parameter={param}&_limit=10000',
+        timeout=timeout
     ) as url:
-        file = pd.json_normalize(json.load(url)['items'])
-        
-    data = file[['stationReference', 'latestReading.value', 'parameter',
-                 'qualifier', 'unitName']].set_index('stationReference')
+        items = _json_loads(url.read())['items']
     
+    # Filter the raw records before any frame or index is built
     if station_reference is not None:
         if isinstance(station_reference, str) == True:
             station_reference = [station_reference]
-        data = data[data.index.isin(station_reference)]
+        station_reference = set(station_reference)
+        items = [it for it in items if it.get('stationReference') in station_reference]
+    
+    # Only latestReading needs flattening, so skip json_normalize
+    data = pd.DataFrame.from_records(
+        [(it.get('stationReference'),
+          it['latestReading'].get('value') 
+          if isinstance(it.get('latestReading'), dict) else None,
+          it.get('parameter'), it.get('qualifier'), it.get('unitName')) 
+         for it in items],
+        columns=['stationReference', 'latestReading.value', 'parameter',
+                 'qualifier', 'unitName']
+    ).set_index('stationReference')
         
     if filename is not None:
         with open(filename,'w') as outfile:
@@ -69,14 +100,14 @@ def get_live_station_readings(station_reference):
     Dictionary indexed by datetime.
     '''
     
-    url = 'https://environment.data.gov.uk/flood-monitoring/data/readings?_limit=10000'
-    with urllib.request.urlopen(
+    resp = _session.get(
         'https://environment.data.gov.uk/flood-monitoring/data/readings.json' +\
-        f'?stationReference={station_reference}&_limit=10000'
-    ) as url:
-        file = pd.DataFrame(json.load(url)['items'])
+        f'?stationReference={station_reference}&_limit=10000', timeout=10
+    )
+    resp.raise_for_status()
+    items = _json_loads(resp.content)['items']
     
-    stndict = file.reindex(['dateTime', 'value'], axis=1).set_index('dateTime').to_dict()['value']
+    stndict = {it['dateTime']: it.get('value') for it in items}
     stndict['stationReference'] = station_reference
     
     return stndict
@@ -87,15 +118,12 @@ def retrieve_CSV():
     Interactive script for retrieving CSV files.
     '''
     
-    matches = []
     keywords = input('Please specify keyword(s) e.g. station, data: ')
+    pattern = re.compile('|'.join(re.escape(keyword.strip()) 
+                                  for keyword in keywords.split(",")), re.I)
 
-
-    for (dirpath,_,files) in os.walk(os.getcwd()):
-        matches += [os.sep.join((dirpath,filename)) for filename in files 
-                    if any(pattern.lower() in filename.lower() 
-                           for pattern in keywords.split(","))
-                    and (".csv" in filename.lower())]
+    matches = [str(path) for path in Path.cwd().rglob('*.[cC][sS][vV]')
+               if pattern.search(path.name)]
 
     print("Found these matches:")
     print(*matches, sep="\n")
@@ -112,6 +140,31 @@ def retrieve_CSV():
 
     
     
+def _readings_frame(stnvallist):
+    '''
+    Assemble the per-station dictionaries from get_live_station_readings
+    into a float DataFrame indexed by datetime, with one column per
+    station (NaN where a station has no reading at that time).
+    '''
+    
+    refs = [stndict.pop('stationReference') for stndict in stnvallist]
+    counts = [len(stndict) for stndict in stnvallist]
+    
+    keys = list(chain.from_iterable(stnvallist))
+    times = pd.Index(keys).unique()
+    
+    readings = pd.to_numeric(pd.Series(list(chain.from_iterable(
+        stndict.values() for stndict in stnvallist)), dtype=object), errors='coerce')
+    
+    values = np.full((len(times), len(refs)), np.nan)
+    values[times.get_indexer(keys), 
+           np.repeat(np.arange(len(refs)), counts)] = readings.to_numpy()
+    
+    return pd.DataFrame(values, index=times, 
+                        columns=pd.Index(refs, name='stationReference'))
+
+    
+    
 def get_all_recent_readings(station_reference=None):
     '''
     Get all recent readings from the past month for a 
@@ -135,19 +188,13 @@ def get_all_recent_readings(station_reference=None):
             return None
     
     
-    def handler(signalnum, frame):
-        raise Exception
-    signal.signal(signal.SIGALRM, handler)
-    signal.alarm(30)
-
     try:
-        data = get_live_station_measures(param='')
+        data = get_live_station_measures(param='', timeout=30)
         data = data[~data.index.duplicated(keep='last')]
-    except:
-        pass
+    except (OSError, http.client.HTTPException, ValueError, KeyError):
+        data = None
     
-    signal.alarm(0) 
-    assert 'data' in locals(), "504 Gateway Timeout Error: Cannot fetch station list"
+    assert data is not None, "504 Gateway Timeout Error: Cannot fetch station list"
     
     print("List of live stations fetched successfully!")
     
@@ -177,7 +224,7 @@ def get_all_recent_readings(station_reference=None):
     executor.shutdown(wait=False)
     
     
-    stnvaldf = pd.DataFrame(stnvallist).set_index('stationReference').transpose()
+    stnvaldf = _readings_frame(stnvallist)
     
     print("Downloaded dataset now saved to variable")
             
@@ -200,10 +247,12 @@ def download_station_info(station_reference):
     Dictionary of station info.
     '''
     
-    with urllib.request.urlopen(
-        f"https://environment.data.gov.uk/flood-monitoring/id/stations/{station_reference}.json"
-    ) as url:
-        file = pd.json_normalize(json.load(url)['items'])
+    resp = _session.get(
+        f"https://environment.data.gov.uk/flood-monitoring/id/stations/{station_reference}.json",
+        timeout=10
+    )
+    resp.raise_for_status()
+    file = pd.json_normalize(_json_loads(resp.content)['items'])
     
     try:
         file['maxOnRecord']=file['stageScale.maxOnRecord.value']
@@ -251,19 +300,13 @@ def download_all_station_info(param="level", df=None):
         return None
     
     
-    def handler(signalnum, frame):
-        raise Exception
-    signal.signal(signal.SIGALRM, handler)
-    signal.alarm(30)
-    
     try:
-        data = get_live_station_measures(param=param)
+        data = get_live_station_measures(param=param, timeout=30)
         data = data[~data.index.duplicated(keep='last')]
-    except:
-        pass
+    except (OSError, http.client.HTTPException, ValueError, KeyError):
+        data = None
     
-    signal.alarm(0) 
-    assert 'data' in locals(), "504 Gateway Timeout Error: Cannot fetch station list"
+    assert data is not None, "504 Gateway Timeout Error: Cannot fetch station list"
     
     print("List of live stations fetched successfully!")
     
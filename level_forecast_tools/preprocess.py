@@ -1,46 +1,106 @@
 """Preprocessing Module for Machine Learning Purposes"""
 
+import os
+
 import numpy as np
 import pandas as pd
 
 import torch
 import torch.nn as nn
 from torch.utils.data import Dataset
+
+from level_forecast_tools._fast import preprocess_inplace
             
 class TsCSVDataset(Dataset):
     '''Generate Pytorch timeseries dataset from csv file'''
     
     def __init__(self, path, sequence_length, lag=1, 
                  mean=None, std=None, 
-                 train_size=0.7, train=True):
+                 train_size=0.7, train=True, dtype=torch.float32):
         
-        dataset = pd.read_csv(path)
+        dataset = pd.read_csv(path, dtype=np.float32, engine='c')
+        columns = dataset.columns
         
-        if len(dataset.columns) > 1:
-            dataset.iloc[:,-1] = dataset.iloc[:,-1].shift(-lag, axis=0)
-            dataset = dataset.iloc[:-lag]
+        if mean is not None or std is not None:
+            mean = pd.Series(mean, index=columns).to_numpy()
+            std = pd.Series(std, index=columns).to_numpy()
         
-        ttsidx = int(train_size*len(dataset.index))
+        # Target shift, statistics and standardisation in one pass
+        values, mean, std = preprocess_inplace(dataset.to_numpy(copy=True), lag,
+                                               train_size, mean=mean, std=std)
+        self.mean = pd.Series(mean, index=columns)
+        self.std = pd.Series(std, index=columns)
         
-        if mean is None and std is None:
-            self.mean = dataset[:ttsidx].mean()
-            self.std = dataset[:ttsidx].std()
-            
-        dataset  = (dataset - self.mean)/self.std
+        ttsidx = int(train_size*len(values))
 
         if train:
-            dataset = dataset.iloc[:ttsidx]
+            values = values[:ttsidx]
         else:
-            dataset = dataset.iloc[ttsidx:]
+            values = values[ttsidx:]
             
         self.sequence_length = sequence_length
             
-        if len(dataset.columns) > 1:
-            self.targets = torch.tensor(dataset.iloc[:,-1].values, dtype=torch.float32)
-            self.data = torch.tensor(dataset.iloc[:,:-1].values, dtype=torch.float32)
+        if len(columns) > 1:
+            self.targets = torch.from_numpy(np.ascontiguousarray(values[:,-1]))
+            self.data = torch.from_numpy(values[:,:-1])
         else:
-            self.targets = torch.tensor(dataset.iloc[lag:].values, dtype=torch.float32)
-            self.data = torch.tensor(dataset.iloc[:-lag].values, dtype=torch.float32)         
+            self.targets = torch.from_numpy(values[lag:])
+            self.data = torch.from_numpy(values[:-lag])
+
+        # Left-pad once with the first row so every window is a plain slice
+        self._padded = torch.cat(
+            (self.data[0:1].expand(sequence_length-1, -1), self.data), 0
+        ).contiguous()
+        
+        # Reduced-precision storage: bfloat16 is kept as is, int8 uses a
+        # symmetric per-column scale and is dequantised per window
+        # (missing values cannot be represented in int8 and become 0)
+        self._scale = None
+        if dtype == torch.int8:
+            self._scale = torch.nan_to_num(self._padded.abs()).amax(0).clamp_min(1e-6)/127
+            self._padded = torch.nan_to_num(self._padded/self._scale).round().to(torch.int8)
+        elif dtype != torch.float32:
+            self._padded = self._padded.to(dtype)
+            self.targets = self.targets.to(dtype)
+        self.data = self._padded[sequence_length-1:]
+
+    
+    @classmethod
+    def from_cached(cls, path, sequence_length, lag=1, 
+                    train_size=0.7, train=True, dtype=torch.float32):
+        '''
+        Load the normalised tensors from a cache file next to the csv
+        file, building it on first use (or when the csv is newer).
+        The cache is memory-mapped, so DataLoader workers share pages.
+        '''
+        
+        cachepath = f"{path}.{'train' if train else 'test'}" +\
+                        f"_seq{sequence_length}_lag{lag}_split{train_size}" +\
+                        f"_{str(dtype).split('.')[-1]}.pt"
+        
+        if (not os.path.exists(cachepath) or 
+            os.path.getmtime(cachepath) < os.path.getmtime(path)):
+            dataset = cls(path, sequence_length, lag=lag,
+                          train_size=train_size, train=train, dtype=dtype)
+            torch.save({'padded': dataset._padded, 'scale': dataset._scale,
+                        'targets': dataset.targets,
+                        'mean': torch.from_numpy(dataset.mean.to_numpy()),
+                        'std': torch.from_numpy(dataset.std.to_numpy()),
+                        'columns': dataset.mean.index.tolist()}, cachepath)
+            return dataset
+        
+        cache = torch.load(cachepath, mmap=True)
+        
+        dataset = cls.__new__(cls)
+        dataset.sequence_length = sequence_length
+        dataset._padded = cache['padded']
+        dataset._scale = cache['scale']
+        dataset.data = dataset._padded[sequence_length-1:]
+        dataset.targets = cache['targets']
+        dataset.mean = pd.Series(cache['mean'].numpy(), index=cache['columns'])
+        dataset.std = pd.Series(cache['std'].numpy(), index=cache['columns'])
+        
+        return dataset
 
         
     def __len__(self):
@@ -49,12 +109,8 @@ class TsCSVDataset(Dataset):
     
     def __getitem__(self, idx): 
         
-        if idx >= self.sequence_length - 1:
-            idx_start = idx - self.sequence_length + 1
-            batch = self.data[idx_start:(idx+1)]
-        else:
-            padding = self.data[0].repeat(self.sequence_length-idx-1, 1)
-            batch = self.data[0:(idx+1)]
-            batch = torch.cat((padding, batch), 0)
-
-        return batch, self.targets[idx]
\ No newline at end of file
+        batch = self._padded[idx:(idx+self.sequence_length)]
+        if self._scale is not None:
+            batch = batch.to(torch.float32)*self._scale
+            
+        return batch, self.targets[idx]